@@ -2,16 +2,24 @@
 """
 Batch Pharmacophore Modeling Script
 Reads CSV input from input/ directory and processes all entries automatically
-Calls the original modeling.py to ensure identical behavior
+Runs the original modeling.py in-process to ensure identical behavior
+(PharmacoNet and its weights are loaded only once for the whole batch)
 Outputs to output/ directory with organized structure
 """
 import argparse
 import csv
 import logging
-import subprocess
+import multiprocessing
+import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+import pandas as pd
+import torch
+
+import modeling
+
 
 class BatchModeling_ArgParser(argparse.ArgumentParser):
     def __init__(self):
@@ -62,10 +70,16 @@ class BatchModeling_ArgParser(argparse.ArgumentParser):
             default="pm",
             help="Extension of pharmacophore model (pm (default) | json)"
         )
+        self.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of parallel worker processes (each loads its own PharmacoNet; with --cuda, workers are spread over visible GPUs)"
+        )
         self.add_argument(
             "--dry_run",
             action="store_true",
-            help="Show commands that would be executed without running them"
+            help="Show modeling calls that would be executed without running them"
         )
 
 
@@ -95,96 +109,169 @@ def validate_csv_structure(csv_path: Path) -> bool:
         return False
 
 
+def _coalesce_columns(df: pd.DataFrame, names: tuple) -> pd.Series:
+    """Row-wise first non-empty (stripped) value among the given (optional) columns"""
+    present = [name for name in names if name in df.columns]
+    if not present:
+        return pd.Series('', index=df.index)
+    values = df[present].apply(lambda column: column.str.strip())
+    return values.replace('', pd.NA).bfill(axis=1).iloc[:, 0].fillna('')
+
+
 def parse_csv_input(csv_path: Path):
     """Parse CSV file and return list of entries"""
-    entries = []
+    df = pd.read_csv(csv_path, dtype=str, keep_default_na=False, skip_blank_lines=True)
+    if df.empty:
+        return []
+    row_num = df.index + 2  # Start at 2 (1 is header)
     
-    with open(csv_path, 'r') as f:
-        reader = csv.DictReader(f)
-        
-        for row_num, row in enumerate(reader, start=2):  # Start at 2 (1 is header)
-            # Skip empty rows
-            if not any(row.values()):
-                continue
-            
-            # Normalize keys
-            normalized_row = {k.lower().strip(): v.strip() if v else None for k, v in row.items()}
-            
-            # Get PDB code (try different variations)
-            pdb_code = (
-                normalized_row.get('pdb_code') or 
-                normalized_row.get('pdb') or 
-                normalized_row.get('pdbcode')
-            )
-            
-            if not pdb_code:
-                logging.warning(f"Row {row_num}: Missing PDB code, skipping")
-                continue
-            
-            # Get ligand ID (optional)
-            ligand_id = (
-                normalized_row.get('ligand_id') or 
-                normalized_row.get('ligand') or 
-                normalized_row.get('ligandid')
-            )
-            
-            # Get chain (optional)
-            chain = normalized_row.get('chain')
-            
-            entry = {
-                'pdb_code': pdb_code.upper(),
-                'ligand_id': ligand_id.upper() if ligand_id else None,
-                'chain': chain.upper() if chain else None,
-                'row_num': row_num
-            }
-            
-            entries.append(entry)
+    # Normalize keys
+    df.columns = df.columns.str.lower().str.strip()
+    
+    # Get PDB code / ligand ID (optional) / chain (optional), trying different variations
+    pdb_code = _coalesce_columns(df, ('pdb_code', 'pdb', 'pdbcode')).str.upper()
+    ligand_id = _coalesce_columns(df, ('ligand_id', 'ligand', 'ligandid')).str.upper()
+    chain = _coalesce_columns(df, ('chain',)).str.upper()
+    
+    # Rows without PDB code are skipped; only non-empty ones deserve a warning
+    has_pdb = (pdb_code != '').to_numpy()
+    if not has_pdb.all():
+        non_empty = (df.loc[~has_pdb] != '').any(axis=1).to_numpy()
+        for num in row_num[~has_pdb][non_empty]:
+            logging.warning("Row %s: Missing PDB code, skipping", num)
+    
+    entries = pd.DataFrame({
+        'pdb_code': pdb_code,
+        'ligand_id': ligand_id.astype(object).where(ligand_id != '', None),
+        'chain': chain.astype(object).where(chain != '', None),
+        'row_num': row_num,
+    })[has_pdb]
     
-    return entries
+    return entries.to_dict('records')
 
 
-def build_modeling_command(entry: dict, output_dir: Path, args) -> list:
-    """Build command to call original modeling.py"""
-    cmd = [sys.executable, "modeling.py"]
+def build_modeling_kwargs(entry: dict, output_dir: Path, args) -> dict:
+    """Build keyword arguments for modeling.run_one"""
+    kwargs = {
+        'pdb': entry['pdb_code'],
+        # Output directory (specific subdirectory for this PDB)
+        'out_dir': str(output_dir / entry['pdb_code']),
+        # Model format
+        'suffix': args.suffix,
+    }
     
-    # PDB code (required)
-    cmd.extend(["--pdb", entry['pdb_code']])
-    
-    # Ligand ID filter (optional)
+    # Ligand ID / Chain filter (optional)
     if entry['ligand_id']:
-        cmd.extend(["--ligand_id", entry['ligand_id']])
-    
-    # Chain filter (optional)
+        kwargs['ligand_id'] = entry['ligand_id']
     if entry['chain']:
-        cmd.extend(["--chain", entry['chain']])
-    
-    # Output directory (specific subdirectory for this PDB)
-    pdb_output_dir = output_dir / entry['pdb_code']
-    cmd.extend(["--out_dir", str(pdb_output_dir)])
-    
-    # Model format
-    cmd.extend(["--suffix", args.suffix])
+        kwargs['chain'] = entry['chain']
     
     # Global options
     if args.cuda:
-        cmd.append("--cuda")
+        kwargs['cuda'] = True
     if args.force:
-        cmd.append("--force")
+        kwargs['force'] = True
     if args.verbose:
-        cmd.append("--verbose")
+        kwargs['verbose'] = True
     if args.weight_path:
-        cmd.extend(["--weight_path", args.weight_path])
+        kwargs['weight_path'] = args.weight_path
     
     # For batch processing, use --all flag if no specific ligand_id is provided
     # This avoids interactive prompts in non-interactive environments (CI/CD)
     if not entry['ligand_id'] and not entry['chain']:
-        cmd.append("--all")
+        kwargs['all'] = True
+    
+    return kwargs
+
+
+def find_cached_outputs(entry: dict, output_dir: Path, suffix: str) -> list:
+    """Return existing pharmacophore models of a fully processed entry (empty list otherwise)
+    
+    modeling.py names its outputs {PDB}_{chain}_{ligand}_model.{suffix} (+ _pymol.pse),
+    and writes {PDB}.pse last when all binding sites are used.
+    """
+    pdb_code = entry['pdb_code']
+    pdb_output_dir = output_dir / pdb_code
+    if not pdb_output_dir.is_dir():
+        return []
+    
+    if not entry['ligand_id'] and not entry['chain']:
+        # --all: complete only once the combined session was saved
+        if not (pdb_output_dir / f"{pdb_code}.pse").exists():
+            return []
+        return sorted(pdb_output_dir.glob(f"{pdb_code}_*_model.{suffix}"))
     
-    return cmd
+    chain = entry['chain'] or '*'
+    ligand_id = entry['ligand_id'] or '*'
+    return [
+        model_path
+        for model_path in sorted(pdb_output_dir.glob(f"{pdb_code}_{chain}_{ligand_id}_model.{suffix}"))
+        if model_path.with_name(f"{model_path.stem}_pymol.pse").exists()
+    ]
+
+
+def format_modeling_call(kwargs: dict) -> str:
+    """Format the equivalent modeling.run_one call for logging"""
+    return "modeling.run_one(" + ", ".join(f"{k}={v!r}" for k, v in kwargs.items()) + ")"
+
+
+def setup_logging(verbose: bool):
+    """Configure root logger (also used by pool workers)"""
+    log_level = logging.DEBUG if verbose else logging.INFO
+    logging.basicConfig(
+        level=log_level,
+        format='%(asctime)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+
+
+SEPARATOR = "=" * 70
+
+# PharmacoNet module of the current process (loaded once, reused for every entry)
+_module = None
+
+
+def init_worker(args, worker_counter, num_gpus: int):
+    """Pool initializer: pin a GPU, setup logging and load PharmacoNet once per worker"""
+    global _module
+    with worker_counter.get_lock():
+        worker_id = worker_counter.value
+        worker_counter.value += 1
+    
+    setup_logging(args.verbose)
+    
+    if args.cuda and num_gpus > 0:
+        # Must be set before the CUDA context is created (first PharmacoNet load)
+        visible = os.environ.get("CUDA_VISIBLE_DEVICES")
+        devices = visible.split(",") if visible else [str(i) for i in range(num_gpus)]
+        os.environ["CUDA_VISIBLE_DEVICES"] = devices[worker_id % len(devices)]
+    elif not args.cuda:
+        # Share the CPU cores between workers instead of oversubscribing them
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // args.workers))
+    
+    _module = modeling.load_module(args.cuda, args.weight_path)
+
+
+def run_entry(task) -> tuple[bool, str | None]:
+    """Run modeling for a single entry, returns (success, error message)"""
+    i, total, description, kwargs = task
+    
+    logging.info("\n%s", SEPARATOR)
+    logging.info("[%d/%d] Processing: %s", i, total, description)
+    logging.info(SEPARATOR)
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        logging.debug("Call: %s\n", format_modeling_call(kwargs))
+    
+    try:
+        modeling.run_one(module=_module, **kwargs)
+        return True, None
+    except Exception as e:
+        return False, str(e)
 
 
 def main(args):
     """Main batch processing function"""
+    global _module
     
     # Setup paths
     input_csv = Path(args.input_csv)
@@ -214,10 +301,11 @@ def main(args):
     
     logging.info(f"Found {len(entries)} entries to process\n")
     
-    # Process each entry by calling modeling.py
     success_count = 0
     failed_entries = []
     
+    # Build modeling calls
+    tasks = []
     for i, entry in enumerate(entries, 1):
         pdb_code = entry['pdb_code']
         ligand_id = entry['ligand_id']
@@ -231,50 +319,64 @@ def main(args):
             desc_parts.append(f"Chain={chain}")
         description = ", ".join(desc_parts)
         
-        logging.info(f"\n{'='*70}")
-        logging.info(f"[{i}/{len(entries)}] Processing: {description}")
-        logging.info(f"{'='*70}")
-        
-        # Build command
-        cmd = build_modeling_command(entry, output_dir, args)
-        
-        # Log command
-        cmd_str = ' '.join(cmd)
-        logging.info(f"Command: {cmd_str}\n")
+        # Skip entries already modeled by a previous run (PharmacoNet is not even loaded)
+        if not args.force:
+            cached = find_cached_outputs(entry, output_dir, args.suffix)
+            if cached:
+                logging.info("[%d/%d] Skip (cached): %s", i, len(entries), description)
+                logging.debug("Existing models: %s", cached)
+                success_count += 1
+                continue
         
-        if args.dry_run:
-            logging.info("[DRY RUN] Command would be executed\n")
+        kwargs = build_modeling_kwargs(entry, output_dir, args)
+        tasks.append((i, len(entries), description, kwargs))
+    
+    if args.dry_run:
+        for i, total, description, kwargs in tasks:
+            logging.info("[%d/%d] %s", i, total, description)
+            logging.info("Call: %s", format_modeling_call(kwargs))
+            logging.info("[DRY RUN] Call would be executed\n")
             success_count += 1
-            continue
-        
-        # Execute modeling.py
-        try:
-            result = subprocess.run(
-                cmd,
-                check=True,
-                capture_output=False,  # Show real-time output
-                text=True
-            )
+        tasks = []
+    
+    # Process each entry by calling modeling.run_one
+    executor = None
+    if args.workers > 1 and len(tasks) > 1:
+        num_gpus = 0
+        if args.cuda:
+            num_gpus = torch.cuda.device_count()
+        # spawn: workers must not inherit a CUDA/torch state from the parent
+        ctx = multiprocessing.get_context("spawn")
+        executor = ProcessPoolExecutor(
+            max_workers=min(args.workers, len(tasks)),
+            mp_context=ctx,
+            initializer=init_worker,
+            initargs=(args, ctx.Value("i", 0), num_gpus),
+        )
+        results = executor.map(run_entry, tasks)
+    else:
+        # Load PharmacoNet once; every entry reuses the same weights (and CUDA context)
+        if tasks:
+            _module = modeling.load_module(args.cuda, args.weight_path)
+        results = map(run_entry, tasks)
+    
+    try:
+        for (_, _, description, _), (ok, error) in zip(tasks, results, strict=True):
+            if ok:
+                success_count += 1
+                logging.info("\n✓ Completed: %s\n", description)
+                continue
             
-            success_count += 1
-            logging.info(f"\n✓ Completed: {description}\n")
-                
-        except subprocess.CalledProcessError as e:
-            logging.error(f"\n✗ Failed: {description}")
-            logging.error(f"Exit code: {e.returncode}\n")
+            logging.error("\n✗ Failed: %s", description)
+            logging.error("Error: %s\n", error)
             failed_entries.append(description)
             
             if not args.continue_on_error:
                 logging.error("Stopping due to error (use --continue_on_error to continue)")
                 sys.exit(1)
-                
-        except Exception as e:
-            logging.error(f"\n✗ Unexpected error for {description}: {e}\n")
-            failed_entries.append(description)
-            
-            if not args.continue_on_error:
-                logging.error("Stopping due to error")
-                sys.exit(1)
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
     
     # Print summary
     logging.info(f"\n{'='*70}")
@@ -300,11 +402,6 @@ if __name__ == "__main__":
     args = parser.parse_args()
     
     # Setup logging
-    log_level = logging.DEBUG if args.verbose else logging.INFO
-    logging.basicConfig(
-        level=log_level,
-        format='%(asctime)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
+    setup_logging(args.verbose)
     
     main(args)
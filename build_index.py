@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+PharmacoNet Model Database Index
+================================
+
+Pack all pharmacophore models (.pm) of a database directory into a single
+index for reverse screening, so models are read from one memory-mapped file
+instead of opening thousands of small files.
+
+The index consists of two files:
+    pm_index.npz: model names (original paths) and byte offsets
+    pm_index.bin: concatenated .pm payloads
+
+Usage:
+    python build_index.py -d output/
+    python reverse_screening.py --model_index output/pm_index.npz -q <SMILES> -o result.csv
+
+Author: PharmacoNet Team
+License: MIT
+"""
+
+import argparse
+import logging
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from reverse_screening import find_models, index_data_path
+
+logger = logging.getLogger("build_index")
+
+
+class BuildIndex_ArgParser(argparse.ArgumentParser):
+    def __init__(self):
+        super().__init__(
+            "build model index",
+            description="Pack a pharmacophore model database into a single memory-mappable index",
+            formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        )
+        self.add_argument(
+            "-d",
+            "--model_database_dir",
+            type=str,
+            help="directory containing pharmacophore model database (.pm files)",
+            required=True,
+        )
+        self.add_argument(
+            "-o",
+            "--out",
+            type=str,
+            help="index path (.npz), default: {model_database_dir}/pm_index.npz",
+        )
+
+
+def build_model_index(model_list, index_path):
+    """Write the index of model_list to index_path (+ payload file)
+
+    Args:
+        model_list: List of .pm file paths
+        index_path: Output index path (must end in .npz)
+
+    Returns:
+        Total number of payload bytes
+    """
+    assert str(index_path).endswith(".npz"), "index path must end in .npz"
+    offsets = np.zeros(len(model_list) + 1, dtype=np.int64)
+    with open(index_data_path(index_path), "wb") as w:
+        for i, model_path in enumerate(model_list):
+            with open(model_path, "rb") as f:
+                offsets[i + 1] = offsets[i] + w.write(f.read())
+    np.savez(index_path, names=np.array(model_list, dtype=str), offsets=offsets)
+    return int(offsets[-1])
+
+
+def main():
+    parser = BuildIndex_ArgParser()
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.model_database_dir):
+        logger.error("Database directory not found: %s", args.model_database_dir)
+        sys.exit(1)
+
+    model_list = find_models(args.model_database_dir)
+    if len(model_list) == 0:
+        logger.error("No .pm files found in database directory!")
+        sys.exit(1)
+    logger.info("Found %d pharmacophore models in database", len(model_list))
+
+    # np.savez appends .npz to other paths, so normalize first and derive the payload path from it
+    index_path = Path(args.out) if args.out else Path(args.model_database_dir) / "pm_index.npz"
+    if index_path.suffix != ".npz":
+        index_path = index_path.with_name(index_path.name + ".npz")
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    num_bytes = build_model_index(model_list, index_path)
+    logger.info(
+        "Saved index to %s and %s (%d models, %.1f MB)",
+        index_path,
+        index_data_path(index_path),
+        len(model_list),
+        num_bytes / 1e6,
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    main()
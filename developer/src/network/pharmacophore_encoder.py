@@ -43,8 +43,8 @@ class PharmacophoreEncoder(nn.Module):
 
         # NOTE: Node features
         if len(hotspots) > 0:
-            hotspot_positions = torch.tensor([node.position for node in hotspots], device=dev)
-            hotspot_features = torch.stack([node.features for node in hotspots])
+            hotspot_positions = hotspots.positions.to(dev)
+            hotspot_features = hotspots.features
             hotspot_features = self.hotspot_mlp(hotspot_features)
         else:
             hotspot_positions = torch.zeros((0, 3), device=dev)
@@ -36,15 +36,15 @@ class ArgParser(argparse.ArgumentParser):
 
 def main(args):
     """
-    return tuple[multi_scale_features, hotspot_info]
-        multi_scale_features: list[torch.Tensor]:
+    return PMNetAttr(multi_scale_features, hotspots)
+        multi_scale_features: MultiScaleFeature:
             - [96, 4, 4, 4], [96, 8, 8, 8], [96, 16, 16, 16], [96, 32, 32, 32], [96, 64, 64, 64]
-        hotspot_info
-            - hotspot_feature: torch.Tensor (192,)
-            - hotspot_position: tuple[float, float, float] - (x, y, z)
-            - hotspot_score: float in [0, 1]
+        hotspots: HotspotBatch (N hotspots)
+            - features: torch.Tensor [N, 192]
+            - positions: torch.Tensor [N, 3] - (x, y, z)
+            - scores: torch.Tensor [N,] in [0, 1]
 
-            - nci_type: str (10 types)
+            - nci_types: list[str] (10 types)
                 'Hydrophobic': Hydrophobic interaction
                 'PiStacking_P': PiStacking (Parallel)
                 'PiStacking_T': PiStacking (T-shaped)
@@ -56,15 +56,14 @@ def main(args):
                 'HBond_pdon': Hydrogen Bond btw Protein Donor & Ligand Acceptor
                 'HBond_ldon': Hydrogen Bond btw Protein Acceptor & Ligand Donor
 
-            - hotspot_type: str (7 types)
+            - types: list[str] (7 types)
                 {'Hydrophobic', 'Aromatic', 'Cation', 'Anion',
                 'Halogen', 'HBond_donor', 'HBond_acceptor'}
-                *** `type` is obtained from `nci_type`.
-            - point_type: str (7 types)
+                *** `types` are obtained from `nci_types`.
+            - density_types: list[str] (7 types)
                 {'Hydrophobic', 'Aromatic', 'Cation', 'Anion',
                 'Halogen', 'HBond_donor', 'HBond_acceptor'}
-                *** `type` is obtained from `nci_type`.
-    ]
+                *** `density_types` are obtained from `nci_types`.
     """
     device = "cuda" if args.cuda else "cpu"
     module: PharmacoNet = get_pmnet_dev(device)
@@ -72,6 +71,10 @@ def main(args):
     state = pmnet_attr.to_state()
     torch.save(state, args.out)
 
+    try:
+        state = torch.load(args.out, mmap=True)
+    except TypeError:  # torch < 2.1 has no mmap option
+        state = torch.load(args.out)
     pmnet_attr = PMNetAttr.from_state(state)
 
 
@@ -57,7 +57,7 @@ class Modeling_ArgParser(argparse.ArgumentParser):
         adv_args.add_argument("--center", nargs="+", type=float, help="coordinate of the center")
 
 
-def main(args):
+def main(args, module: PharmacoNet | None = None):
     logging.info(pmnet.__description__)
     assert args.prefix is not None or args.pdb is not None, "MISSING PREFIX: `--prefix` or `--pdb`"
     PREFIX = args.prefix if args.prefix else args.pdb
@@ -69,9 +69,9 @@ def main(args):
         SAVE_DIR = Path(args.out_dir)
     SAVE_DIR.mkdir(exist_ok=True, parents=True)
 
-    # NOTE: Load PharmacoNet
-    module = PharmacoNet("cuda" if args.cuda else "cpu", weight_path=args.weight_path)
-    logging.info("Load PharmacoNet finish")
+    # NOTE: Load PharmacoNet (skipped when a preloaded module is given)
+    if module is None:
+        module = load_module(args.cuda, args.weight_path)
 
     # NOTE: Set Protein
     protein_path: str
@@ -243,6 +243,37 @@ def main(args):
     return SUCCESS
 
 
+def load_module(cuda: bool = False, weight_path: str | None = None) -> PharmacoNet:
+    module = PharmacoNet("cuda" if cuda else "cpu", weight_path=weight_path)
+    logging.info("Load PharmacoNet finish")
+    return module
+
+
+def run_one(
+    pdb: str,
+    ligand_id: str | None = None,
+    chain: str | None = None,
+    out_dir: str | None = None,
+    module: PharmacoNet | None = None,
+    **kwargs,
+):
+    """In-process equivalent of `python modeling.py --pdb PDB ...`
+
+    Remaining keyword arguments (`suffix`, `force`, `all`, `cuda`, `weight_path`, ...)
+    override the command-line defaults of `Modeling_ArgParser`.
+    Pass a preloaded `module` to reuse the PharmacoNet weights across calls.
+    """
+    args = Modeling_ArgParser().parse_args([])
+    args.pdb = pdb
+    args.ligand_id = ligand_id
+    args.chain = chain
+    args.out_dir = out_dir
+    for key, value in kwargs.items():
+        assert hasattr(args, key), f"Unknown argument: {key}"
+        setattr(args, key, value)
+    return main(args, module)
+
+
 def ask_prompt(number_dic):
     flag = False
     while not flag:
@@ -12,12 +12,23 @@ License: MIT
 
 import argparse
 import csv
+import heapq
+import logging
+import logging.handlers
 import multiprocessing
+import os
 import sys
 from functools import partial
 from pathlib import Path
 
+import numpy as np
+import pandas as pd
+import tqdm
+
 from pmnet.pharmacophore_model import PharmacophoreModel
+from pmnet.scoring.ligand import Ligand
+
+logger = logging.getLogger("reverse_screening")
 
 
 class ReverseScreening_ArgParser(argparse.ArgumentParser):
@@ -45,7 +56,11 @@ class ReverseScreening_ArgParser(argparse.ArgumentParser):
             "--model_database_dir",
             type=str,
             help="directory containing pharmacophore model database (.pm files)",
-            required=True,
+        )
+        cfg_args.add_argument(
+            "--model_index",
+            type=str,
+            help="packed model database index (.npz) created by build_index.py, instead of --model_database_dir",
         )
         cfg_args.add_argument(
             "-o", 
@@ -129,29 +144,135 @@ def is_smiles(query_str):
     return not Path(query_str).exists()
 
 
-def score_model(model_path, query_molecule, weight, is_smiles_query, num_conformers):
-    """Score a single pharmacophore model against query molecule
+def find_models(database_dir):
+    """List .pm files under database_dir (recursively) as plain string paths"""
+    return [
+        os.path.join(root, filename)
+        for root, _, filenames in os.walk(database_dir)
+        for filename in filenames
+        if filename.endswith(".pm")
+    ]
+
+
+def index_data_path(index_path):
+    """Path of the packed model payloads belonging to a model index (.npz -> .bin)"""
+    return Path(index_path).with_suffix(".bin")
+
+
+def precompute_conformers(query_molecule, is_smiles_query, num_conformers):
+    """Embed the query conformers once (in the main process)
+    
+    Returns:
+        Picklable ligand state (see Ligand.to_state): heavy-atom molblock and
+        contiguous float32 conformer coordinates
+    """
+    if is_smiles_query:
+        ligand = Ligand.load_from_smiles(query_molecule, num_conformers)
+    else:
+        ligand = Ligand.load_from_file(query_molecule)
+    state = ligand.to_state()
+    state['atom_positions'] = np.ascontiguousarray(state['atom_positions'], dtype=np.float32)
+    return state
+
+
+# Per-worker state set by init_worker: query ligands as (name, Ligand | None),
+# the model database paths (workers receive index ranges into it) and, with a
+# model index, the memory-mapped model payloads and their offsets
+_query_ligands = []
+_model_list = []
+_model_data = None
+_model_offsets = None
+
+
+def init_worker(query_states, model_list, log_queue, model_index=None):
+    """Pool initializer: rebuild the precomputed query ligands and keep the model list once per worker
+    
+    Log records are forwarded to the main process through log_queue.
+    With model_index (see build_index.py), models are read from its memory-mapped payload file.
+    """
+    global _query_ligands, _model_list, _model_data, _model_offsets
+    root_logger = logging.getLogger()
+    root_logger.handlers = [logging.handlers.QueueHandler(log_queue)]
+    root_logger.setLevel(logging.INFO)
+    _query_ligands = [
+        (name, Ligand.from_state(state) if state is not None else None)
+        for name, state in query_states
+    ]
+    _model_list = model_list
+    if model_index is not None:
+        with np.load(model_index) as index:
+            _model_offsets = index['offsets']
+        _model_data = np.memmap(index_data_path(model_index), dtype=np.uint8, mode='r')
+
+
+def load_model(index):
+    """Load the index-th model of the database (from the model index payloads if available)"""
+    if _model_data is not None:
+        start, stop = _model_offsets[index], _model_offsets[index + 1]
+        return PharmacophoreModel.loads(memoryview(_model_data[start:stop]))
+    return PharmacophoreModel.load(_model_list[index])
+
+
+def score_model(index, weight):
+    """Score a single pharmacophore model against all query molecules
+    
+    Query ligands and the model list are shared with the workers through
+    init_worker.
     
     Args:
-        model_path: Path to .pm pharmacophore model file
-        query_molecule: SMILES string or file path
+        index: Index of the pharmacophore model in the model list
         weight: Dictionary of feature weights
-        is_smiles_query: Boolean indicating if query is SMILES
-        num_conformers: Number of conformers to generate
         
     Returns:
-        Tuple of (model_path, score)
+        Tuple of (model_path, scores), one score per query (-1.0 on error)
     """
+    model_path = _model_list[index]
     try:
-        model = PharmacophoreModel.load(str(model_path))
-        if is_smiles_query:
-            score = model.scoring_smiles(query_molecule, num_conformers, weight)
-        else:
-            score = model.scoring_file(query_molecule, weight)
-        return str(model_path), score
+        model = load_model(index)
     except Exception as e:
-        print(f"Error processing {model_path}: {e}", file=sys.stderr)
-        return str(model_path), -1.0
+        logger.error("Error processing %s: %s", model_path, e)
+        return str(model_path), [-1.0] * len(_query_ligands)
+    
+    scores = []
+    for query_name, ligand in _query_ligands:
+        if ligand is None:
+            scores.append(-1.0)
+            continue
+        try:
+            scores.append(model.scoring_ligand(ligand, weight))
+        except Exception as e:
+            logger.error("Error processing %s (%s): %s", model_path, query_name, e)
+            scores.append(-1.0)
+    return str(model_path), scores
+
+
+def score_model_range(index_range, weight):
+    """Score models _model_list[start:stop] against all query molecules
+    
+    Returns:
+        List of (model_path, scores), see score_model
+    """
+    start, stop = index_range
+    return [score_model(index, weight) for index in range(start, stop)]
+
+
+def push_result(heap, model_path, score, min_score, top_n=None):
+    """Push a result into a bounded min-heap
+    
+    Only results with score >= min_score are kept; with top_n the heap never
+    holds more than top_n entries.
+    """
+    if score < min_score:
+        return
+    if top_n is None or len(heap) < top_n:
+        heapq.heappush(heap, (score, model_path))
+    elif heap and (score, model_path) > heap[0]:
+        heapq.heapreplace(heap, (score, model_path))
+
+
+def sorted_results(heap):
+    """Return heap entries as (model_path, score), sorted by score (descending)"""
+    return [(model_path, score) for score, model_path in sorted(heap, reverse=True)]
 
 
 def parse_query_csv(csv_path):
@@ -182,18 +303,18 @@ def parse_query_csv(csv_path):
             file_path = row.get('File', row.get('file', ''))
             
             if not name:
-                print(f"Warning: Skipping row with missing name: {row}", file=sys.stderr)
+                logger.warning("Skipping row with missing name: %s", row)
                 continue
             
             if smiles:
                 queries.append({'name': name, 'query': smiles, 'is_smiles': True})
             elif file_path:
                 if not Path(file_path).exists():
-                    print(f"Warning: File not found for {name}: {file_path}", file=sys.stderr)
+                    logger.warning("File not found for %s: %s", name, file_path)
                     continue
                 queries.append({'name': name, 'query': file_path, 'is_smiles': False})
             else:
-                print(f"Warning: Skipping {name} - no SMILES or File provided", file=sys.stderr)
+                logger.warning("Skipping %s - no SMILES or File provided", name)
     
     return queries
 
@@ -210,12 +331,12 @@ def main():
 
     # Parse queries
     if args.query_csv:
-        print(f"Loading queries from CSV: {args.query_csv}")
+        logger.info("Loading queries from CSV: %s", args.query_csv)
         queries = parse_query_csv(args.query_csv)
         if not queries:
-            print("ERROR: No valid queries found in CSV file!")
+            logger.error("No valid queries found in CSV file!")
             sys.exit(1)
-        print(f"Found {len(queries)} query molecules")
+        logger.info("Found %d query molecules", len(queries))
     else:
         # Single query
         is_smiles_query = is_smiles(args.query_molecule)
@@ -225,22 +346,34 @@ def main():
             'is_smiles': is_smiles_query
         }]
         if is_smiles_query:
-            print(f"Query molecule (SMILES): {args.query_molecule}")
+            logger.info("Query molecule (SMILES): %s", args.query_molecule)
         else:
-            print(f"Query molecule (file): {args.query_molecule}")
+            logger.info("Query molecule (file): %s", args.query_molecule)
 
-    # Find all .pm files in database directory
-    database_path = Path(args.model_database_dir)
-    if not database_path.exists():
-        print(f"ERROR: Database directory not found: {args.model_database_dir}")
-        sys.exit(1)
+    if not args.model_database_dir and not args.model_index:
+        parser.error("Must provide either --model_database_dir or --model_index")
+    if args.model_database_dir and args.model_index:
+        parser.error("Cannot use both --model_database_dir and --model_index")
     
-    model_list = list(database_path.rglob("*.pm"))
-    print(f"Found {len(model_list)} pharmacophore models in database")
+    if args.model_index:
+        # Models packed by build_index.py
+        if not Path(args.model_index).exists() or not index_data_path(args.model_index).exists():
+            logger.error("Model index not found: %s", args.model_index)
+            sys.exit(1)
+        with np.load(args.model_index) as index:
+            model_list = index['names'].tolist()
+    else:
+        # Find all .pm files in database directory
+        database_path = Path(args.model_database_dir)
+        if not database_path.exists():
+            logger.error("Database directory not found: %s", args.model_database_dir)
+            sys.exit(1)
+        model_list = find_models(args.model_database_dir)
+    logger.info("Found %d pharmacophore models in database", len(model_list))
 
     if len(model_list) == 0:
-        print("ERROR: No .pm files found in database directory!")
-        print(f"Please run batch_modeling.py first to build the database.")
+        logger.error("No .pm files found in database directory!")
+        logger.error("Please run batch_modeling.py first to build the database.")
         sys.exit(1)
 
     # Prepare weights
@@ -258,45 +391,64 @@ def main():
     for feat, w in weight.items():
         print(f"  {feat:20s}: {w}")
 
+    # Embed query conformers once; workers receive them through the pool initializer
+    logger.info("Preparing %d query molecule(s) (conformers: %d)...", len(queries), args.num_conformers)
+    query_states = []
+    for query_info in queries:
+        try:
+            state = precompute_conformers(query_info['query'], query_info['is_smiles'], args.num_conformers)
+        except Exception as e:
+            logger.error("Error preparing query %s: %s", query_info['name'], e)
+            state = None
+        query_states.append((query_info['name'], state))
+    
+    # Score all queries against each model in a single pass, so every model
+    # file is loaded once and the pool is started once
+    logger.info("Screening %d query molecule(s) against %d protein models...", len(queries), len(model_list))
+    f = partial(score_model_range, weight=weight)
+    
+    # The model list is handed to each worker once (pool initializer), tasks are
+    # only (start, stop) index ranges into it
+    chunksize = max(1, len(model_list) // (args.cpus * 8))
+    index_ranges = [(start, min(start + chunksize, len(model_list))) for start in range(0, len(model_list), chunksize)]
+    
+    # Stream results as models finish; filter by minimum score and apply
+    # top_n filter if specified (one bounded heap per query)
+    heaps = [[] for _ in queries]
+    
+    # Worker log records go through a queue and are emitted by the main process
+    log_queue = multiprocessing.Queue()
+    listener = logging.handlers.QueueListener(log_queue, *logging.getLogger().handlers, respect_handler_level=True)
+    listener.start()
+    try:
+        initargs = (query_states, model_list, log_queue, args.model_index)
+        with multiprocessing.Pool(args.cpus, initializer=init_worker, initargs=initargs) as pool:
+            with tqdm.tqdm(total=len(model_list), leave=False) as pbar:
+                for range_results in pool.imap_unordered(f, index_ranges):
+                    for model_path, scores in range_results:
+                        for heap, score in zip(heaps, scores, strict=True):
+                            push_result(heap, model_path, score, args.min_score, args.top_n)
+                    pbar.update(len(range_results))
+    finally:
+        listener.stop()
+    
     # Process all queries
     all_results = []
     
-    for query_idx, query_info in enumerate(queries, start=1):
+    for query_idx, (query_info, heap) in enumerate(zip(queries, heaps, strict=True), start=1):
         query_name = query_info['name']
-        query_molecule = query_info['query']
-        is_smiles_query = query_info['is_smiles']
         
         print(f"\n{'='*80}")
-        print(f"Processing query {query_idx}/{len(queries)}: {query_name}")
+        print(f"Query {query_idx}/{len(queries)}: {query_name}")
         print(f"{'='*80}")
         
-        # Score query molecule against all models
-        print(f"Screening against {len(model_list)} protein models...")
-        f = partial(
-            score_model,
-            query_molecule=query_molecule,
-            weight=weight,
-            is_smiles_query=is_smiles_query,
-            num_conformers=args.num_conformers,
-        )
-
-        with multiprocessing.Pool(args.cpus) as pool:
-            result = pool.map(f, model_list)
-
-        # Filter by minimum score
-        result = [(path, score) for path, score in result if score >= args.min_score]
-
         # Sort by score (descending - highest score first)
-        result.sort(key=lambda x: x[1], reverse=True)
-
-        # Apply top_n filter if specified
-        if args.top_n is not None:
-            result = result[: args.top_n]
-
+        result = sorted_results(heap)
+        
         # Add query name to results
         for model_path, score in result:
             all_results.append((query_name, model_path, score))
-
+        
         # Print top 10 for this query
         print(f"\nTOP 10 MATCHING PROTEINS for {query_name}:")
         print("-" * 80)
@@ -316,11 +468,7 @@ def main():
     out_path = Path(args.out)
     out_path.parent.mkdir(parents=True, exist_ok=True)
     
-    with open(args.out, "w", newline='') as w:
-        writer = csv.writer(w)
-        writer.writerow(["query_name", "pharmacophore_model", "score"])
-        for query_name, model_path, score in all_results:
-            writer.writerow([query_name, model_path, score])
+    pd.DataFrame(all_results, columns=["query_name", "pharmacophore_model", "score"]).to_csv(args.out, index=False)
 
     print("\nReverse screening complete! ✓")
     print(f"Results saved to: {args.out}")
@@ -336,4 +484,5 @@ def main():
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
     main()
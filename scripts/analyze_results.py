@@ -7,16 +7,167 @@ Analyze and visualize reverse screening results.
 
 Usage:
     python scripts/analyze_results.py results/screening_results.csv
+    python scripts/analyze_results.py results/screening_results.csv --engine polars  # large result files
 """
 
 import argparse
 import sys
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
+import matplotlib
+matplotlib.use('Agg')  # Render to files only, no GUI backend
 import matplotlib.pyplot as plt
+import numba as nb
 import seaborn as sns
 
+try:
+    import pyarrow  # noqa: F401
+    CSV_ENGINE = 'pyarrow'  # Multi-threaded CSV parsing
+except ImportError:
+    CSV_ENGINE = 'c'
+
+RESULT_COLUMNS = ['query_name', 'pharmacophore_model', 'score']
+
+
+def _stem(path):
+    """Model name without directory and extension (Path(path).stem) with plain string operations"""
+    base = path.rpartition('/')[2].rpartition('\\')[2]
+    return base.rpartition('.')[0] or base
+
+
+def model_stems(models):
+    """_stem of each model; on categorical columns it is applied once per category"""
+    return models.map(_stem)
+
+
+def read_results(results_csv):
+    """Read the reverse screening results (categorical names, float32 scores)"""
+    return pd.read_csv(
+        results_csv,
+        usecols=RESULT_COLUMNS,
+        dtype={'query_name': 'category', 'pharmacophore_model': 'category', 'score': 'float32'},
+        engine=CSV_ENGINE,
+    )
+
+
+def load_and_rank_pandas(results_csv):
+    """Load results and compute per-query statistics and top-20 hits with pandas
+    
+    Returns:
+        Tuple of (results, per-query statistics, top-20 hits per query sorted by descending score)
+    """
+    df = read_results(results_csv)
+    # Sort once by query and descending score; per-query top-N lists are then the group heads
+    df_sorted = df.sort_values(['query_name', 'score'], ascending=[True, False])
+    by_query = df_sorted.groupby('query_name', sort=False, observed=True)
+    query_stats = by_query.agg({
+        'score': ['count', 'mean', 'max']
+    })
+    query_stats.columns = ['Total_Hits', 'Mean_Score', 'Max_Score']
+    return df, query_stats, by_query.head(20)
+
+
+def load_and_rank_polars(results_csv):
+    """Same as load_and_rank_pandas, but parse, aggregate and rank with (multi-threaded) Polars
+    
+    Only the results are converted to pandas for plotting. Requires polars and pyarrow.
+    """
+    import polars as pl
+
+    lf = pl.scan_csv(results_csv, schema_overrides={'score': pl.Float32}).select(RESULT_COLUMNS)
+    query_stats_lf = lf.group_by('query_name').agg(
+        pl.len().cast(pl.Int64).alias('Total_Hits'),
+        pl.col('score').mean().alias('Mean_Score'),
+        pl.col('score').max().alias('Max_Score'),
+    ).sort('query_name')
+    top20_lf = lf.sort(['query_name', 'score'], descending=[False, True], maintain_order=True).group_by(
+        'query_name', maintain_order=True
+    ).head(20)
+    results, query_stats, top20 = pl.collect_all([lf, query_stats_lf, top20_lf])
+
+    categories = {'query_name': 'category', 'pharmacophore_model': 'category'}
+    df = results.to_pandas().astype(categories)
+    query_stats = query_stats.to_pandas().set_index('query_name')
+    top20 = top20.to_pandas().astype(categories)
+    return df, query_stats, top20
+
+
+@nb.njit(cache=True)
+def _insert_top_k(top_scores, top_indices, score, index):
+    """Insert (score, index) into descending top-k arrays, after existing entries with an equal score"""
+    j = top_scores.shape[0] - 1
+    if not score > top_scores[j]:
+        return
+    while j > 0 and score > top_scores[j - 1]:
+        top_scores[j] = top_scores[j - 1]
+        top_indices[j] = top_indices[j - 1]
+        j -= 1
+    top_scores[j] = score
+    top_indices[j] = index
+
+
+@nb.njit(parallel=True, cache=True)
+def _reduce(query_codes, scores, num_queries, k):
+    """Per-query hit count, score sum, max score and top-k row indices in a single pass
+    
+    Rows are split into one chunk per thread; chunk results are merged in order,
+    so equal scores keep their row order like a stable sort.
+    Rows without query (code -1) or score (NaN) are skipped.
+    
+    Returns:
+        counts [Q,], sums [Q,], maxs [Q,], top_indices [Q, k] (descending score, -1 if fewer than k hits)
+    """
+    num_chunks = nb.get_num_threads()
+    num_rows = scores.shape[0]
+    counts = np.zeros((num_chunks, num_queries), dtype=np.int64)
+    sums = np.zeros((num_chunks, num_queries), dtype=np.float64)
+    maxs = np.full((num_chunks, num_queries), -np.inf, dtype=np.float64)
+    top_scores = np.full((num_chunks, num_queries, k), -np.inf, dtype=np.float64)
+    top_indices = np.full((num_chunks, num_queries, k), -1, dtype=np.int64)
+    for c in nb.prange(num_chunks):
+        for i in range(c * num_rows // num_chunks, (c + 1) * num_rows // num_chunks):
+            q = query_codes[i]
+            score = scores[i]
+            if q < 0 or np.isnan(score):
+                continue
+            counts[c, q] += 1
+            sums[c, q] += score
+            maxs[c, q] = max(maxs[c, q], score)
+            _insert_top_k(top_scores[c, q], top_indices[c, q], score, i)
+
+    for c in range(1, num_chunks):
+        for q in range(num_queries):
+            counts[0, q] += counts[c, q]
+            sums[0, q] += sums[c, q]
+            maxs[0, q] = max(maxs[0, q], maxs[c, q])
+            for j in range(k):
+                if top_indices[c, q, j] < 0:
+                    break
+                _insert_top_k(top_scores[0, q], top_indices[0, q], top_scores[c, q, j], top_indices[c, q, j])
+    return counts[0], sums[0], maxs[0], top_indices[0]
+
+
+def load_and_rank_fast(results_csv):
+    """Same as load_and_rank_pandas, but aggregate and rank in one pass of a compiled (numba) kernel
+    
+    The results are not sorted; only the per-query top-20 rows are selected.
+    """
+    df = read_results(results_csv)
+    queries = df['query_name'].cat.categories
+    counts, sums, maxs, top_indices = _reduce(
+        df['query_name'].cat.codes.to_numpy(), df['score'].to_numpy(), len(queries), 20
+    )
+    observed = counts > 0
+    query_stats = pd.DataFrame(
+        {'Total_Hits': counts, 'Mean_Score': sums / np.maximum(counts, 1), 'Max_Score': maxs},
+        index=pd.Index(queries, name='query_name'),
+    )[observed]
+    top_indices = top_indices[observed]
+    top20 = df.iloc[top_indices[top_indices >= 0]]
+    return df, query_stats, top20
+
 
 def main():
     parser = argparse.ArgumentParser(description="Analyze reverse screening results")
@@ -25,7 +176,13 @@ def main():
                        help="Output directory for plots and reports")
     parser.add_argument("--score_threshold", type=float, default=30.0,
                        help="Score threshold for strong hits")
+    parser.add_argument("--engine", type=str, default="pandas", choices=["pandas", "polars"],
+                       help="Engine for loading and ranking results (polars: multi-threaded, for large files)")
+    parser.add_argument("--fast", action="store_true",
+                       help="Aggregate and rank with a compiled numba kernel (pandas engine, for very large files)")
     args = parser.parse_args()
+    if args.fast and args.engine != 'pandas':
+        parser.error("--fast is only supported with --engine pandas")
 
     # Load results
     if not Path(args.results_csv).exists():
@@ -33,7 +190,12 @@ def main():
         sys.exit(1)
     
     print(f"Loading results from: {args.results_csv}")
-    df = pd.read_csv(args.results_csv)
+    if args.engine == 'polars':
+        df, query_stats, top20 = load_and_rank_polars(args.results_csv)
+    elif args.fast:
+        df, query_stats, top20 = load_and_rank_fast(args.results_csv)
+    else:
+        df, query_stats, top20 = load_and_rank_pandas(args.results_csv)
     
     if df.empty:
         print("ERROR: Results file is empty!")
@@ -50,16 +212,19 @@ def main():
     print("SUMMARY STATISTICS")
     print("="*80)
     
+    num_queries = df['query_name'].nunique()
+    num_targets = df['pharmacophore_model'].nunique()
     print(f"\nTotal number of query-target pairs: {len(df)}")
-    print(f"Number of unique queries: {df['query_name'].nunique()}")
-    print(f"Number of unique targets: {df['pharmacophore_model'].nunique()}")
+    print(f"Number of unique queries: {num_queries}")
+    print(f"Number of unique targets: {num_targets}")
     
+    score_stats = df['score'].agg(['min', 'max', 'mean', 'median', 'std'])
     print(f"\nScore statistics:")
-    print(f"  Min:    {df['score'].min():.4f}")
-    print(f"  Max:    {df['score'].max():.4f}")
-    print(f"  Mean:   {df['score'].mean():.4f}")
-    print(f"  Median: {df['score'].median():.4f}")
-    print(f"  Std:    {df['score'].std():.4f}")
+    print(f"  Min:    {score_stats['min']:.4f}")
+    print(f"  Max:    {score_stats['max']:.4f}")
+    print(f"  Mean:   {score_stats['mean']:.4f}")
+    print(f"  Median: {score_stats['median']:.4f}")
+    print(f"  Std:    {score_stats['std']:.4f}")
     
     strong_hits = df[df['score'] >= args.score_threshold]
     print(f"\nStrong hits (score >= {args.score_threshold}): {len(strong_hits)}")
@@ -69,10 +234,13 @@ def main():
     print("PER-QUERY STATISTICS")
     print("="*80)
     
-    query_stats = df.groupby('query_name').agg({
-        'score': ['count', 'mean', 'max']
-    }).round(4)
-    query_stats.columns = ['Total_Hits', 'Mean_Score', 'Max_Score']
+    # Top 20 (heatmap), top 10 (promiscuity, report) and top 5 (listing) hits per query, each sliced from the previous
+    top20 = top20.assign(_model_stem=model_stems(top20['pharmacophore_model']))
+    top_hits = top20.groupby('query_name', sort=False, observed=True).head(10)
+    top5 = top_hits.groupby('query_name', sort=False, observed=True).head(5)
+    
+    # float32 scores: widen before rounding so the report shows 4 decimals
+    query_stats = query_stats.astype({'Mean_Score': 'float64', 'Max_Score': 'float64'}).round(4)
     print("\n" + query_stats.to_string())
     
     # Top targets for each query
@@ -80,30 +248,25 @@ def main():
     print("TOP 5 TARGETS PER QUERY")
     print("="*80)
     
-    for query_name in df['query_name'].unique():
-        query_df = df[df['query_name'] == query_name].nlargest(5, 'score')
+    for query_name, query_df in top5.groupby('query_name', sort=False, observed=True):
         print(f"\n{query_name}:")
-        for idx, (_, row) in enumerate(query_df.iterrows(), start=1):
-            model_name = Path(row['pharmacophore_model']).stem
-            print(f"  {idx}. {model_name:50s} Score: {row['score']:8.4f}")
+        model_names = query_df['_model_stem'].to_numpy()
+        scores = query_df['score'].to_numpy()
+        for idx, (model_name, score) in enumerate(zip(model_names, scores, strict=True), start=1):
+            print(f"  {idx}. {model_name:50s} Score: {score:8.4f}")
     
     # Promiscuous targets (bind to many queries)
     print("\n" + "="*80)
     print("PROMISCUOUS TARGETS (appear in top 10 for multiple queries)")
     print("="*80)
     
-    # Get top 10 for each query
-    top_hits = df.groupby('query_name').apply(
-        lambda x: x.nlargest(10, 'score')
-    ).reset_index(drop=True)
-    
-    target_counts = top_hits.groupby('pharmacophore_model').size().sort_values(ascending=False)
+    target_counts = top_hits['pharmacophore_model'].value_counts(sort=True)
     promiscuous = target_counts[target_counts > 1]
     
     if len(promiscuous) > 0:
         print("\nTargets appearing in multiple query top-10 lists:")
         for target, count in promiscuous.head(20).items():
-            target_name = Path(target).stem
+            target_name = _stem(target)
             print(f"  {target_name:50s} Appears in {count} queries")
     else:
         print("\nNo promiscuous targets found (each target matches only one query)")
@@ -118,100 +281,90 @@ def main():
     plt.rcParams['figure.figsize'] = (12, 8)
     
     # 1. Score distribution
-    plt.figure(figsize=(10, 6))
-    sns.histplot(df['score'], bins=50, kde=True)
-    plt.axvline(args.score_threshold, color='red', linestyle='--', 
-                label=f'Threshold ({args.score_threshold})')
-    plt.xlabel('Pharmacophore Score', fontsize=12)
-    plt.ylabel('Frequency', fontsize=12)
-    plt.title('Score Distribution Across All Matches', fontsize=14, fontweight='bold')
-    plt.legend()
-    plt.tight_layout()
+    fig, ax = plt.subplots(figsize=(10, 6))
+    sns.histplot(df['score'], bins=50, kde=True, ax=ax)
+    ax.axvline(args.score_threshold, color='red', linestyle='--', 
+               label=f'Threshold ({args.score_threshold})')
+    ax.set_xlabel('Pharmacophore Score', fontsize=12)
+    ax.set_ylabel('Frequency', fontsize=12)
+    ax.set_title('Score Distribution Across All Matches', fontsize=14, fontweight='bold')
+    ax.legend()
+    fig.tight_layout()
     score_dist_path = output_dir / 'score_distribution.png'
-    plt.savefig(score_dist_path, dpi=300)
+    fig.savefig(score_dist_path, dpi=300)
     print(f"  Score distribution plot saved: {score_dist_path}")
-    plt.close()
+    plt.close(fig)
     
     # 2. Box plot by query
-    plt.figure(figsize=(12, 6))
-    df_sorted = df.sort_values('query_name')
-    sns.boxplot(data=df_sorted, x='query_name', y='score')
-    plt.axhline(args.score_threshold, color='red', linestyle='--', alpha=0.5)
-    plt.xlabel('Query Molecule', fontsize=12)
-    plt.ylabel('Pharmacophore Score', fontsize=12)
-    plt.title('Score Distribution by Query Molecule', fontsize=14, fontweight='bold')
-    plt.xticks(rotation=45, ha='right')
-    plt.tight_layout()
+    fig, ax = plt.subplots(figsize=(12, 6))
+    sns.boxplot(data=df, x='query_name', y='score', ax=ax)
+    ax.axhline(args.score_threshold, color='red', linestyle='--', alpha=0.5)
+    ax.set_xlabel('Query Molecule', fontsize=12)
+    ax.set_ylabel('Pharmacophore Score', fontsize=12)
+    ax.set_title('Score Distribution by Query Molecule', fontsize=14, fontweight='bold')
+    plt.setp(ax.get_xticklabels(), rotation=45, ha='right')
+    fig.tight_layout()
     boxplot_path = output_dir / 'score_by_query_boxplot.png'
-    plt.savefig(boxplot_path, dpi=300)
+    fig.savefig(boxplot_path, dpi=300)
     print(f"  Box plot saved: {boxplot_path}")
-    plt.close()
+    plt.close(fig)
     
     # 3. Top hits heatmap (if multiple queries)
-    if df['query_name'].nunique() > 1:
-        # Get top 20 targets per query
-        top_n = 20
-        top_targets = df.groupby('query_name').apply(
-            lambda x: x.nlargest(top_n, 'score')['pharmacophore_model'].tolist()
-        )
-        
-        # Get unique targets that appear in any top list
-        all_top_targets = set()
-        for targets in top_targets:
-            all_top_targets.update(targets)
+    if num_queries > 1:
+        # Get unique targets that appear in any top-20 list
+        all_top_targets = pd.Index(top20['pharmacophore_model'].unique())
         
         # Create pivot table with simplified names
-        pivot_data = []
-        for target in all_top_targets:
-            target_name = Path(target).stem
-            row = {'target': target_name}
-            for query in df['query_name'].unique():
-                score = df[(df['query_name'] == query) & 
-                          (df['pharmacophore_model'] == target)]['score'].values
-                row[query] = score[0] if len(score) > 0 else 0
-            pivot_data.append(row)
+        top_df = df.loc[df['pharmacophore_model'].isin(all_top_targets)]
+        top_df = top_df.assign(_model_stem=model_stems(top_df['pharmacophore_model']))
+        pivot_df = top_df.pivot_table(index='_model_stem', columns='query_name', values='score',
+                                      aggfunc='first', fill_value=0, observed=True)
+        # Top 30 targets by best score (partial selection, then sort only those)
+        max_scores = pivot_df.max(axis=1).to_numpy()
+        k = min(30, len(max_scores))
+        top_idx = np.argpartition(max_scores, -k)[-k:]
+        top_idx = top_idx[np.argsort(-max_scores[top_idx], kind='stable')]
+        pivot_df = pivot_df.iloc[top_idx]
         
-        pivot_df = pd.DataFrame(pivot_data).set_index('target')
-        pivot_df = pivot_df.loc[pivot_df.max(axis=1).nlargest(30).index]  # Top 30 targets
-        
-        plt.figure(figsize=(12, 16))
+        fig, ax = plt.subplots(figsize=(12, 16))
         sns.heatmap(pivot_df, cmap='YlOrRd', annot=False, fmt='.1f',
-                   cbar_kws={'label': 'Pharmacophore Score'})
-        plt.xlabel('Query Molecule', fontsize=12)
-        plt.ylabel('Target Protein', fontsize=12)
-        plt.title('Query-Target Score Heatmap (Top 30 Targets)', fontsize=14, fontweight='bold')
-        plt.tight_layout()
+                    cbar_kws={'label': 'Pharmacophore Score'}, ax=ax)
+        ax.set_xlabel('Query Molecule', fontsize=12)
+        ax.set_ylabel('Target Protein', fontsize=12)
+        ax.set_title('Query-Target Score Heatmap (Top 30 Targets)', fontsize=14, fontweight='bold')
+        fig.tight_layout()
         heatmap_path = output_dir / 'query_target_heatmap.png'
-        plt.savefig(heatmap_path, dpi=300)
+        fig.savefig(heatmap_path, dpi=300)
         print(f"  Heatmap saved: {heatmap_path}")
-        plt.close()
+        plt.close(fig)
     
     # Save detailed report
     report_path = output_dir / 'analysis_report.txt'
-    with open(report_path, 'w') as f:
-        f.write("PharmacoNet Reverse Screening Analysis Report\n")
-        f.write("=" * 80 + "\n\n")
-        f.write(f"Input file: {args.results_csv}\n")
-        f.write(f"Score threshold: {args.score_threshold}\n\n")
-        
-        f.write("SUMMARY STATISTICS\n")
-        f.write("-" * 80 + "\n")
-        f.write(f"Total results: {len(df)}\n")
-        f.write(f"Unique queries: {df['query_name'].nunique()}\n")
-        f.write(f"Unique targets: {df['pharmacophore_model'].nunique()}\n")
-        f.write(f"Strong hits (>= {args.score_threshold}): {len(strong_hits)}\n\n")
-        
-        f.write(query_stats.to_string())
-        f.write("\n\n")
-        
-        f.write("TOP 10 TARGETS PER QUERY\n")
-        f.write("-" * 80 + "\n")
-        for query_name in df['query_name'].unique():
-            query_df = df[df['query_name'] == query_name].nlargest(10, 'score')
-            f.write(f"\n{query_name}:\n")
-            for idx, (_, row) in enumerate(query_df.iterrows(), start=1):
-                model_name = Path(row['pharmacophore_model']).stem
-                f.write(f"  {idx:2d}. {model_name:50s} {row['score']:8.4f}\n")
+    lines = [
+        "PharmacoNet Reverse Screening Analysis Report\n",
+        "=" * 80 + "\n\n",
+        f"Input file: {args.results_csv}\n",
+        f"Score threshold: {args.score_threshold}\n\n",
+        "SUMMARY STATISTICS\n",
+        "-" * 80 + "\n",
+        f"Total results: {len(df)}\n",
+        f"Unique queries: {num_queries}\n",
+        f"Unique targets: {num_targets}\n",
+        f"Strong hits (>= {args.score_threshold}): {len(strong_hits)}\n\n",
+        query_stats.to_string(),
+        "\n\n",
+        "TOP 10 TARGETS PER QUERY\n",
+        "-" * 80 + "\n",
+    ]
+    for query_name, query_df in top_hits.groupby('query_name', sort=False, observed=True):
+        lines.append(f"\n{query_name}:\n")
+        model_names = query_df['_model_stem'].to_numpy()
+        scores = query_df['score'].to_numpy()
+        lines.extend(
+            f"  {idx:2d}. {model_name:50s} {score:8.4f}\n"
+            for idx, (model_name, score) in enumerate(zip(model_names, scores, strict=True), start=1)
+        )
+    report_path.write_text(''.join(lines))
     
     print(f"  Analysis report saved: {report_path}")
     
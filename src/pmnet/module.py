@@ -23,7 +23,7 @@ from pmnet.pharmacophore_model import (
     INTERACTION_TO_PHARMACOPHORE,
     PharmacophoreModel,
 )
-from pmnet.typing import HotspotInfo, MultiScaleFeature, PMNetAttr
+from pmnet.typing import HotspotBatch, HotspotInfo, MultiScaleFeature, PMNetAttr
 from pmnet.utils.download_weight import download_pretrained_model
 from pmnet.utils.smoothing import GaussianSmoothing
 
@@ -169,20 +169,16 @@ class PharmacoNet:
         hotspot_features = token_features[indices]  # [Ntoken', F]
         del protein_image, mask, token_pos, tokens
 
-        hotspot_infos: list[HotspotInfo] = []
-        for hotspot, score, position, features in zip(hotspots, rel_scores, hotpsot_pos, hotspot_features, strict=True):
-            interaction_type = C.INTERACTION_LIST[int(hotspot[3])]
-            hotspot_infos.append(
-                HotspotInfo(
-                    type=INTERACTION_TO_HOTSPOT[interaction_type],
-                    score=float(score),
-                    features=features,
-                    position=tuple(position.tolist()),
-                    nci_type=interaction_type,
-                    density_type=INTERACTION_TO_PHARMACOPHORE[interaction_type],
-                )
-            )
-        return PMNetAttr(multi_scale_features, hotspot_infos)
+        nci_types = [C.INTERACTION_LIST[int(typ)] for typ in hotspots[:, 3].tolist()]
+        hotspot_batch = HotspotBatch(
+            types=[INTERACTION_TO_HOTSPOT[interaction_type] for interaction_type in nci_types],
+            nci_types=nci_types,
+            density_types=[INTERACTION_TO_PHARMACOPHORE[interaction_type] for interaction_type in nci_types],
+            positions=hotpsot_pos,
+            scores=torch.tensor(rel_scores, dtype=torch.float, device=hotpsot_pos.device),
+            features=hotspot_features,
+        )
+        return PMNetAttr(multi_scale_features, hotspot_batch)
 
     def print_log(self, level, log):
         if self.logger is None:
@@ -57,6 +57,19 @@ class PharmacophoreModel:
         self.node_dict: dict[str, list[ModelNode]]
         self.node_cluster_dict: dict[str, list[ModelNodeCluster]]
         self.node_clusters: list[ModelNodeCluster]
+        self._distance_mean_stds: NDArray[np.float32] | None = None
+
+    @property
+    def distance_mean_stds(self) -> NDArray[np.float32]:
+        """Dense table of edge distances (mean, std) [N_nodes, N_nodes, 2], NaN for node pairs without edge"""
+        if self._distance_mean_stds is None:
+            num_nodes = len(self.nodes)
+            table = np.full((num_nodes, num_nodes, 2), np.nan, dtype=np.float32)
+            for edge in self.edges:
+                i, j = edge.node_indices
+                table[i, j] = table[j, i] = (edge.distance_mean, edge.distance_std)
+            self._distance_mean_stds = table
+        return self._distance_mean_stds
 
     def scoring_pbmol(
         self,
@@ -99,6 +112,14 @@ class PharmacophoreModel:
         ligand = Ligand.load_from_smiles(ligand_smiles, num_conformers)
         return self._scoring(ligand, weights)
 
+    def scoring_ligand(
+        self,
+        ligand: Ligand,
+        weights: dict[str, float] | None = None,
+    ) -> float:
+        """Score a prebuilt Ligand; reuse the same Ligand to score many models."""
+        return self._scoring(ligand, weights)
+
     def _scoring(
         self,
         ligand: Ligand,
@@ -177,6 +198,13 @@ class PharmacophoreModel:
         model.__setstate__(state)
         return model
 
+    @classmethod
+    def loads(cls, data: bytes | memoryview):
+        """Load from the (pickled) content of a .pm file"""
+        model = cls()
+        model.__setstate__(pickle.loads(data))
+        return model
+
     def __getstate__(self):
         state = dict(
             pdbblock=self.pdbblock,
@@ -191,6 +219,7 @@ class PharmacophoreModel:
         return state
 
     def __setstate__(self, state):
+        self._distance_mean_stds = None
         self.pdbblock = state.get("pdbblock")
         self.nodes = [ModelNode(self, **kwargs) for kwargs in state["nodes"]]
         self.edges = [ModelEdge(self, **kwargs) for kwargs in state["edges"]]
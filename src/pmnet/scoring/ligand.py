@@ -60,6 +60,15 @@ class Ligand:
 
         self.graph = LigandGraph(self)
 
+    def to_state(self) -> dict:
+        """Picklable state: heavy-atom molblock and conformer coordinates [N_atoms, N_conformers, 3]"""
+        return {"molblock": self.pbmol.write("mol"), "atom_positions": self.atom_positions}
+
+    @classmethod
+    def from_state(cls, state: dict) -> Ligand:
+        pbmol = pybel.readstring("mol", state["molblock"])
+        return cls(pbmol, state["atom_positions"], conformer_axis=1, _unsafe=True)
+
     @classmethod
     def load_from_file(cls, filename: str | Path, num_conformers: int | None = None) -> Ligand:
         assert filename is not None
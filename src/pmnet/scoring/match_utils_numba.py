@@ -151,13 +151,20 @@ def __numba_run_self(
         score_array[c] += likelihood * normalize_coeff * score_coeff
 
 
-def __get_distance_mean_std(model_node1, model_node2) -> tuple[float, float]:
+def __get_distance_mean_stds(model_node_list1, model_node_list2) -> NDArray[np.float32]:
     """
-    model_node1: ModelNode
-    model_node2: ModelNode
+    model_node_list1: List[ModelNode] (M)
+    model_node_list2: List[ModelNode] (N)
+
+    return: [M, N, 2] - gathered from the dense per-model table instead of per-pair edge lookups
     """
-    edge = model_node1.neighbor_edge_dict[model_node2]
-    return edge.distance_mean, edge.distance_std
+    table = model_node_list1[0].graph.distance_mean_stds
+    indices1 = [model_node.index for model_node in model_node_list1]
+    indices2 = [model_node.index for model_node in model_node_list2]
+    mean_stds = table[np.ix_(indices1, indices2)]
+    if np.isnan(mean_stds[..., 1]).any():
+        raise KeyError("No edge between model nodes")
+    return mean_stds
 
 
 def scoring_matching_pair(
@@ -180,13 +187,7 @@ def scoring_matching_pair(
             ligand_edge = ligand_node1.neighbor_edge_dict[ligand_node2]
             distances = ligand_edge.distances
 
-            mean_stds = np.array(
-                [
-                    [__get_distance_mean_std(model_node1, model_node2) for model_node2 in model_node_list2]
-                    for model_node1 in model_node_list1
-                ],
-                dtype=np.float32,
-            )  # [M, N, 2]
+            mean_stds = __get_distance_mean_stds(model_node_list1, model_node_list2)  # [M, N, 2]
             __numba_run(distances, mean_stds, weights1, weights2, match_scores, num_fails)
             if min(num_fails) > match_threshold:
                 return (-1,) * num_conformers
@@ -213,13 +214,7 @@ def scoring_matching_self(
         ligand_edge = ligand_node1.neighbor_edge_dict[ligand_node2]
         distances = ligand_edge.distances
 
-        mean_stds = np.array(
-            [
-                [__get_distance_mean_std(model_node1, model_node2) for model_node2 in model_node_list2]
-                for model_node1 in model_node_list1
-            ],
-            dtype=np.float32,
-        )  # [M, N, 2]
+        mean_stds = __get_distance_mean_stds(model_node_list1, model_node_list2)  # [M, N, 2]
         __numba_run_self(
             distances,
             mean_stds,
@@ -5,6 +5,24 @@ import torch
 from typing_extensions import Self
 
 
+def _to_cpu(*tensors: torch.Tensor | None) -> tuple[torch.Tensor | None, ...]:
+    """Copy tensors to host memory
+
+    CUDA tensors are copied asynchronously into pinned memory with a single synchronization,
+    tensors on other devices with a regular `.cpu()`.
+    """
+    on_cuda = any(t is not None and t.is_cuda for t in tensors)
+    tensors = tuple(
+        (torch.empty(t.shape, dtype=t.dtype, pin_memory=True).copy_(t, non_blocking=True) if t.is_cuda else t.cpu())
+        if t is not None
+        else None
+        for t in tensors
+    )
+    if on_cuda:
+        torch.cuda.synchronize()
+    return tensors
+
+
 class MultiScaleFeature(NamedTuple):
     size4: torch.Tensor  # [96, 4, 4, 4]
     size8: torch.Tensor  # [96, 8, 8, 8]
@@ -12,6 +30,20 @@ class MultiScaleFeature(NamedTuple):
     size32: torch.Tensor  # [96, 32, 32, 32]
     size64: torch.Tensor  # [96, 64, 64, 64]
 
+    def cpu(self) -> "MultiScaleFeature":
+        """Copy to host memory into one contiguous pinned buffer with a single synchronization
+
+        The returned features are views of the host buffer, so they are also saved as one storage.
+        """
+        if not self.size4.is_cuda:
+            return self._make(v.cpu() for v in self)
+        buffer = torch.empty(sum(v.numel() for v in self), dtype=self.size4.dtype, pin_memory=True)
+        views = buffer.split([v.numel() for v in self])
+        for view, v in zip(views, self, strict=True):
+            view.copy_(v.reshape(-1), non_blocking=True)
+        torch.cuda.synchronize()
+        return self._make(view.view(v.shape) for view, v in zip(views, self, strict=True))
+
 
 @dataclass(frozen=True, slots=True)
 class HotspotInfo:
@@ -23,11 +55,26 @@ class HotspotInfo:
     density_type: str
     density_map: torch.Tensor | None = None
 
+
+@dataclass(frozen=True, slots=True)
+class HotspotBatch:
+    """Hotspots stored column-wise: one stacked tensor per numerical field"""
+
+    types: list[str]
+    nci_types: list[str]
+    density_types: list[str]
+    positions: torch.Tensor  # [N, 3]
+    scores: torch.Tensor  # [N,]
+    features: torch.Tensor  # [N, F]
+    density_maps: torch.Tensor | None = None  # [N, D, H, W]
+
+    def __len__(self) -> int:
+        return len(self.types)
+
     def to_state(self) -> dict:
         state = {k: getattr(self, k) for k in self.__dataclass_fields__}
-        for k in state.keys():
-            if isinstance(state[k], torch.Tensor):
-                state[k] = state[k].cpu()
+        keys = ("positions", "scores", "features", "density_maps")
+        state.update(zip(keys, _to_cpu(*(state[k] for k in keys)), strict=True))
         return state
 
     @classmethod
@@ -38,15 +85,15 @@ class HotspotInfo:
 @dataclass(frozen=True, slots=True)
 class PMNetAttr:
     multi_scale_features: MultiScaleFeature
-    hotspots: list[HotspotInfo]
+    hotspots: HotspotBatch
 
     def to_state(self) -> dict:
-        multi_scale_features = tuple(v.cpu() for v in self.multi_scale_features)
-        hotspots = [info.to_state() for info in self.hotspots]
+        multi_scale_features = tuple(self.multi_scale_features.cpu())
+        hotspots = self.hotspots.to_state()
         return {"multi_scale_features": multi_scale_features, "hotspots": hotspots}
 
     @classmethod
     def from_state(cls, state: dict) -> Self:
         multi_scale_features = MultiScaleFeature(*state["multi_scale_features"])
-        hotspots = [HotspotInfo.from_state(info) for info in state["hotspot_infos"]]
+        hotspots = HotspotBatch.from_state(state["hotspots"])
         return cls(multi_scale_features, hotspots)
@@ -36,8 +36,8 @@ class PharmacophoreEncoder(nn.Module):
         multi_scale_features, hotspots = pmnet_attr.multi_scale_features, pmnet_attr.hotspots
         dev = pmnet_attr.multi_scale_features[0].device
         if len(pmnet_attr.hotspots) > 0:
-            hotspot_positions = torch.tensor([node.position for node in hotspots], device=dev)
-            hotspot_features = torch.stack([node.features for node in hotspots]).to(dev)
+            hotspot_positions = hotspots.positions.to(dev)
+            hotspot_features = hotspots.features.to(dev)
             hotspot_features = self.hotspot_mlp(hotspot_features)
         else:
             hotspot_positions = torch.zeros((0, 3), device=dev)
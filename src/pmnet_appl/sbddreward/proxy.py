@@ -20,7 +20,7 @@ import torch.nn as nn
 import torch_geometric.data as gd
 from torch import Tensor
 
-from pmnet.typing import HotspotInfo, MultiScaleFeature
+from pmnet.typing import PMNetAttr
 from pmnet_appl.base.proxy import BaseProxy
 from pmnet_appl.sbddreward.data import NUM_ATOM_FEATURES, NUM_BOND_FEATURES, smi2graph
 from pmnet_appl.sbddreward.network import (
@@ -38,7 +38,7 @@ class SBDDReward_Proxy(BaseProxy):
     def _setup_model(self):
         self.model = _RewardNetwork()
 
-    def _get_cache(self, pmnet_attr: tuple[MultiScaleFeature, list[HotspotInfo]]) -> Cache:
+    def _get_cache(self, pmnet_attr: PMNetAttr) -> Cache:
         return self.model.get_cache(pmnet_attr)
 
     @torch.no_grad()
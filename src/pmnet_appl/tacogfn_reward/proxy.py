@@ -59,7 +59,7 @@ class TacoGFN_Proxy(BaseProxy):
     def _get_cache(self, pmnet_attr: PMNetAttr) -> Cache:
         multi_scale_features, hotspots = pmnet_attr.multi_scale_features, pmnet_attr.hotspots
         if len(hotspots) > 0:
-            hotspot_features = torch.stack([node.features for node in hotspots])
+            hotspot_features = hotspots.features
         else:
             hotspot_features = torch.zeros((0, 192), device=self.device)
         pocket_features_list, hotspot_features_list = self.model.ready_to_calculate(